@@ -3,6 +3,7 @@ from pathlib import Path
 
 OUTPUT_DIR = os.getenv("OUTPUT_DIR", "/output")
 DATA_DIR = os.getenv("DATA_DIR", "/data")
+INTERMEDIATE_DIR = "intermediate"
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
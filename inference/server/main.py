@@ -7,17 +7,27 @@ from fastapi.staticfiles import StaticFiles
 import json
 import uuid
 import pypdfium2
-import glob
 import psutil
 import asyncio
+import multiprocessing
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pydantic import BaseModel
 
 from inference.server.chunking import maybe_chunk_pdf
 from inference.server.merge import (
     _get_image_files,
     _merge_chunk_files,
+    _get_merged_file,
+    _chunks_complete,
     _extract_worker_info,
 )
+from inference.server.render import (
+    OUTPUT_FORMATS,
+    _has_intermediate,
+    _render_chunk_files,
+)
 from inference.server.files import (
     get_output_path,
     get_file_path,
@@ -31,10 +41,145 @@ JOB_TYPES = [
 ]
 
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 32))
+MERGE_WORKERS = int(os.getenv("MERGE_WORKERS", 2))
+MERGE_RETRY_DELAY = int(os.getenv("MERGE_RETRY_DELAY", 5))
+MERGE_MAX_ATTEMPTS = int(os.getenv("MERGE_MAX_ATTEMPTS", 5))
 RABBIT_MQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
 
 connection = None
 channel = None
+merge_connection = None
+merge_pool = None
+
+# One lock per job, so a job is never merged, rendered or cleared twice at once
+# Entries are dropped once no coroutine holds or waits on them
+job_locks = {}
+job_lock_users = {}
+
+# Jobs a poll has already enqueued a merge for, so repeated polls don't flood the queue
+merge_requested = set()
+
+
+@asynccontextmanager
+async def job_lock(file_id: str):
+    lock = job_locks.setdefault(file_id, asyncio.Lock())
+    job_lock_users[file_id] = job_lock_users.get(file_id, 0) + 1
+    try:
+        async with lock:
+            yield
+    finally:
+        job_lock_users[file_id] -= 1
+        if job_lock_users[file_id] == 0:
+            del job_lock_users[file_id]
+            del job_locks[file_id]
+
+
+def create_merge_pool():
+    # The server is multi-threaded by the time it merges, so don't fork it
+    return ProcessPoolExecutor(
+        max_workers=MERGE_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+    )
+
+
+async def run_locked_in_pool(file_id: str, fn, *args):
+    """Run a blocking merge/render function in the merge pool, holding the job's lock.
+
+    A pool whose child died (e.g. OOM killed) stays broken, so it is replaced and the call retried once.
+    """
+    global merge_pool
+    async with job_lock(file_id):
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = merge_pool
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                print(f"Merge pool broken while processing {file_id}, recreating it")
+                if merge_pool is pool:
+                    pool.shutdown(wait=False)
+                    merge_pool = create_merge_pool()
+                if attempt == 1:
+                    raise
+
+
+async def publish(routing_key: str, body: dict, reconnect: bool = True):
+    """Publish a persistent message, reconnecting to RabbitMQ first if needed."""
+    if any(
+        [
+            connection is None,
+            channel is None,
+            getattr(connection, "is_closed", True),
+            getattr(channel, "is_closed", True),
+        ]
+    ):
+        if not reconnect:
+            raise RuntimeError("RabbitMQ connection is not open")
+        await setup_rabbitmq_connection()
+
+    if connection is None or channel is None:
+        raise HTTPException(
+            status_code=500, detail="Failed to establish RabbitMQ connection"
+        )
+
+    await channel.default_exchange.publish(
+        aio_pika.Message(
+            body=json.dumps(body).encode(),
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        ),
+        routing_key=routing_key,
+    )
+
+
+async def on_merge_message(message: aio_pika.abc.AbstractIncomingMessage):
+    """Merge a job's chunk files once the worker for its final chunk reports completion."""
+    async with message.process(requeue=True):
+        body = json.loads(message.body.decode())
+        file_id = body["id"]
+        attempt = body.get("attempt", 0)
+        output_path = get_output_path(file_id)
+
+        try:
+            # Job was cleared before the merge ran
+            if not os.path.exists(output_path):
+                return
+
+            try:
+                merged_file = await run_locked_in_pool(
+                    file_id, _merge_chunk_files, output_path
+                )
+            except (BrokenProcessPool, OSError) as e:
+                # Crashed merge process or transient IO error, worth retrying
+                await retry_merge(file_id, output_path, attempt, str(e))
+                return
+            except Exception as e:
+                print(f"Failed to merge {file_id}: {e}")
+                write_merge_error(output_path, str(e))
+                return
+
+            if merged_file is None:
+                # Chunk outputs can land just after the worker info
+                await retry_merge(
+                    file_id, output_path, attempt, "chunk files incomplete"
+                )
+        finally:
+            merge_requested.discard(file_id)
+
+
+def write_merge_error(output_path: str, reason: str):
+    with open(os.path.join(output_path, "ERROR"), "w", encoding="utf-8") as f:
+        f.write(f"Merging failed: {reason}")
+
+
+async def retry_merge(file_id: str, output_path: str, attempt: int, reason: str):
+    """Republish a merge after a delay, or fail the job once it has run out of attempts."""
+    if attempt + 1 >= MERGE_MAX_ATTEMPTS:
+        print(f"Merge for {file_id} failed ({reason}), giving up")
+        write_merge_error(output_path, f"{reason} after {MERGE_MAX_ATTEMPTS} attempts")
+        return
+
+    print(f"Merge for {file_id} failed ({reason}), retrying")
+    await asyncio.sleep(MERGE_RETRY_DELAY)
+    await publish("merge_queue", {"id": file_id, "attempt": attempt + 1})
 
 
 async def setup_rabbitmq_connection():
@@ -43,6 +188,10 @@ async def setup_rabbitmq_connection():
     max_retries = 10
     retry_delay = 2
 
+    # A robust connection keeps reconnecting on its own, so close it before replacing it
+    if connection is not None and not connection.is_closed:
+        await connection.close()
+
     for attempt in range(max_retries):
         try:
             # Async connection to RabbitMQ
@@ -78,7 +227,17 @@ async def lifespan(app: FastAPI):
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
+    global merge_pool, merge_connection
+    merge_pool = create_merge_pool()
+
     await setup_rabbitmq_connection()
+
+    # Workers publish here when the final chunk of a job lands
+    # The consumer gets its own connection, so reconnects for publishing never add a second one
+    merge_connection = await aio_pika.connect_robust(f"amqp://{RABBIT_MQ_HOST}")
+    merge_channel = await merge_connection.channel()
+    merge_queue = await merge_channel.declare_queue("merge_queue", durable=True)
+    await merge_queue.consume(on_merge_message)
     yield
 
     # Clean up connection on shutdown
@@ -89,9 +248,13 @@ async def lifespan(app: FastAPI):
     if connection is not None:
         await connection.close()
 
+    await merge_connection.close()
+
     del connection
     del channel
 
+    merge_pool.shutdown()
+
 
 app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory=OUTPUT_DIR), name="static")
@@ -123,6 +286,7 @@ async def status():
         "num_workers_running": worker_processes,
         "rabbitmq_host": RABBIT_MQ_HOST,
         "chunk_size": CHUNK_SIZE,
+        "merge_workers": MERGE_WORKERS,
         "data_dir": DATA_DIR,
         "output_dir": OUTPUT_DIR,
     }
@@ -148,36 +312,79 @@ async def marker_results(request: Request, file_id: str, download: bool = False)
         with open(error_file, "r") as f:
             return {"file_id": file_id, "status": "failed", "error": f.read()}
 
-    # Check for cached merged file
-    merged_files = glob.glob(os.path.join(output_path, "merged.*"))
-    if merged_files:
-        if not download:
-            return {"file_id": file_id, "status": "done"}
+    # Merging happens in the background once the final chunk lands, only read the finished file here
+    merged_file = _get_merged_file(output_path)
+    if merged_file is None:
+        # Jobs finished by older workers never published a merge, so enqueue one for them
+        if file_id not in merge_requested and _chunks_complete(output_path):
+            # Polls stay cheap, don't wait on a RabbitMQ reconnect here
+            try:
+                await publish("merge_queue", {"id": file_id}, reconnect=False)
+                merge_requested.add(file_id)
+            except Exception as e:
+                print(f"Failed to enqueue merge for {file_id}: {e}")
+        return {"file_id": file_id, "status": "processing"}
+
+    if not download:
+        return {"file_id": file_id, "status": "done"}
 
-        # Return cached merged result with images
-        with open(merged_files[0], "r") as f:
-            merged_result = f.read()
+    with open(merged_file, "r") as f:
+        merged_result = f.read()
+
+    response = {"file_id": file_id, "status": "done", "result": merged_result}
+    response["images"] = _get_image_files(request, output_path, file_id)
+    response["worker_info"] = _extract_worker_info(output_path)
+    return response
 
-        response = {"file_id": file_id, "status": "done", "result": merged_result}
-        response["images"] = _get_image_files(request, output_path, file_id)
-        response["worker_info"] = _extract_worker_info(output_path)
-        return response
 
-    # Try to merge chunk files
-    merged_result, ext = _merge_chunk_files(output_path)
+@app.get("/marker/render")
+async def marker_render(
+    request: Request, file_id: str, output_format: str = "markdown"
+):
+    """Renders a finished marker job into another format from its cached intermediate, without re-inference.
 
-    if merged_result is None:
+    Query Parameters:
+    - file_id (str): ID of the job to render. Must have been submitted with `keep_intermediate`.
+    - output_format (str): One of `markdown`, `html` or `json`.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported output_format {output_format}, must be one of {list(OUTPUT_FORMATS)}",
+        )
+
+    output_path = get_output_path(file_id)
+    if not os.path.exists(output_path):
         return {"file_id": file_id, "status": "processing"}
 
-    # Job is complete - prepare response
-    response = {"file_id": file_id, "status": "done"}
+    error_file = os.path.join(output_path, "ERROR")
+    if os.path.exists(error_file):
+        with open(error_file, "r") as f:
+            return {"file_id": file_id, "status": "failed", "error": f.read()}
 
-    if download:
-        response["worker_info"] = _extract_worker_info(output_path)
-        response["result"] = merged_result
-        response["images"] = _get_image_files(request, output_path, file_id)
+    if not _has_intermediate(output_path):
+        if _get_merged_file(output_path) is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="No intermediate was kept for this job, resubmit it with `keep_intermediate` set in the config",
+            )
+        return {"file_id": file_id, "status": "processing"}
 
-    return response
+    # Reads the cached rendered{ext} if an earlier request already rendered it
+    rendered_result = await run_locked_in_pool(
+        file_id, _render_chunk_files, output_path, OUTPUT_FORMATS[output_format]
+    )
+
+    if rendered_result is None:
+        return {"file_id": file_id, "status": "processing"}
+
+    return {
+        "file_id": file_id,
+        "status": "done",
+        "output_format": output_format,
+        "result": rendered_result,
+        "images": _get_image_files(request, output_path, file_id),
+    }
 
 
 @app.post("/marker/inference")
@@ -213,28 +420,7 @@ async def marker_inference(file: UploadFile, config: Optional[str] = Form("{}"))
 
     for request in requests:
         try:
-            if any(
-                [
-                    connection is None,
-                    channel is None,
-                    getattr(connection, "is_closed", True),
-                    getattr(channel, "is_closed", True),
-                ]
-            ):
-                await setup_rabbitmq_connection()
-
-            if connection is None or channel is None:
-                raise HTTPException(
-                    status_code=500, detail="Failed to establish RabbitMQ connection"
-                )
-
-            await channel.default_exchange.publish(
-                aio_pika.Message(
-                    body=json.dumps(request).encode(),
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-                ),
-                routing_key="marker_queue",
-            )
+            await publish("marker_queue", request)
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Internal server error: {str(e)}"
@@ -251,8 +437,11 @@ class ClearRequest(BaseModel):
 async def marker_clear(request_data: ClearRequest):
     file_id = request_data.file_id
     output_path = get_output_path(file_id)
-    if os.path.exists(output_path):
-        shutil.rmtree(output_path)
+
+    # Wait for any running merge or render to finish before removing its files
+    async with job_lock(file_id):
+        if os.path.exists(output_path):
+            shutil.rmtree(output_path)
 
     data_paths = get_potential_file_paths(file_id)
     for data_path in data_paths:
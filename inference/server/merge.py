@@ -86,8 +86,43 @@ def _extract_worker_info(output_path: str):
     return {"pages": total_pages, "worker_time": total_time}
 
 
+def _write_atomic(file_path: str, content: str):
+    """Write to a temporary file and rename it into place, so readers never see a partial file."""
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, file_path)
+
+
+def _get_merged_file(output_path: str):
+    merged_files = glob.glob(os.path.join(output_path, "merged.*"))
+    merged_files = [fname for fname in merged_files if not fname.endswith(".tmp")]
+    return merged_files[0] if merged_files else None
+
+
+def _chunks_complete(output_path: str):
+    """Whether every chunk has finished, workers write their worker info after the chunk output."""
+    output_files = [
+        fname
+        for fname in glob.glob(os.path.join(output_path, "*-of-*.*"))
+        if "meta.json" not in fname
+    ]
+
+    if not output_files:
+        return False
+
+    fname, _ = os.path.splitext(os.path.basename(output_files[0]))
+    num_chunks = int(fname.split("-of-")[1])
+    worker_files = glob.glob(os.path.join(output_path, "*_worker_info.json"))
+    return len(worker_files) >= num_chunks
+
+
 def _merge_chunk_files(output_path: str):
-    """Helper function to merge chunk files and return the merged result."""
+    """Helper function to merge chunk files into merged.*, returning its path. Safe to call repeatedly."""
+    merged_file_path = _get_merged_file(output_path)
+    if merged_file_path is not None:
+        return merged_file_path
+
     output_files = [
         fname
         for fname in glob.glob(os.path.join(output_path, "*-of-*.*"))
@@ -95,13 +130,13 @@ def _merge_chunk_files(output_path: str):
     ]
 
     if not output_files:
-        return None, None
+        return None
 
-    fname, ext = os.path.splitext(output_files[0])
+    fname, ext = os.path.splitext(os.path.basename(output_files[0]))
     num_chunks = int(fname.split("-of-")[1])
 
     if len(output_files) < num_chunks:
-        return None, None
+        return None
 
     # Read and merge all chunk files
     results = []
@@ -113,7 +148,6 @@ def _merge_chunk_files(output_path: str):
 
     # Cache the merged result
     merged_file_path = os.path.join(output_path, f"merged{ext}")
-    with open(merged_file_path, "w") as f:
-        f.write(merged_result)
+    _write_atomic(merged_file_path, merged_result)
 
-    return merged_result, ext
+    return merged_file_path
@@ -0,0 +1,183 @@
+import base64
+import glob
+import json
+import os
+import re
+from typing import Dict, Tuple
+from bs4 import BeautifulSoup
+from markdownify import MarkdownConverter
+
+from inference.server.merge import merge_marker_results, _write_atomic
+from inference.server.files import INTERMEDIATE_DIR
+
+OUTPUT_FORMATS = {
+    "markdown": ".md",
+    "html": ".html",
+    "json": ".json",
+}
+IMAGE_EXT = os.getenv("OUTPUT_IMAGE_FORMAT", "JPEG").lower()
+
+
+class Markdownify(MarkdownConverter):
+    """
+    Mirrors the options of marker's markdown renderer, without importing marker (and torch) into the server.
+    Tables use markdownify's layout, so cell padding can differ from marker's own output.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            heading_style="ATX",
+            bullets="-",
+            escape_misc=False,
+            escape_underscores=True,
+            escape_asterisks=True,
+            sub_symbol="<sub>",
+            sup_symbol="<sup>",
+            table_infer_header=True,
+            **kwargs,
+        )
+
+    def convert_math(self, el, text, parent_tags):
+        if el.get("display") == "block":
+            return f"\n$${text.strip()}$$\n"
+        return f" ${text.strip()}$ "
+
+    def convert_span(self, el, text, parent_tags):
+        if el.get("id"):
+            return f'<span id="{el["id"]}">{text}</span>'
+        return text
+
+    def escape(self, text, parent_tags):
+        text = super().escape(text, parent_tags)
+        if "math" not in parent_tags:
+            text = text.replace("$", r"\$")
+        return text
+
+
+def _image_name(block_id: str) -> str:
+    return f"{block_id.replace('/', '_')}.{IMAGE_EXT}"
+
+
+def _merge_consecutive_tags(html: str, tag: str) -> str:
+    return re.sub(rf"</{tag}>(\s*)<{tag}>", lambda m: " " if m.group(1) else "", html)
+
+
+def json_to_html(block: dict) -> Tuple[str, Dict[str, str]]:
+    """
+    Rebuild the html for a marker JSON block by resolving its content-refs, the same way marker's html renderer does.
+    Returns the html and the base64 images it references, keyed by filename.
+    """
+    children = block.get("children") or []
+    html = block.get("html") or ""
+
+    if not children:
+        # Leaf blocks keep refs only for the images stored alongside them
+        block_images = block.get("images") or {}
+        images = {}
+        soup = BeautifulSoup(html, "html.parser")
+        for ref in soup.find_all("content-ref"):
+            src = ref.attrs.get("src")
+            if src in block_images:
+                images[_image_name(src)] = block_images[src]
+                ref.replace_with(
+                    BeautifulSoup(
+                        f"<p><img src='{_image_name(src)}'></p>", "html.parser"
+                    )
+                )
+            else:
+                ref.decompose()
+        html = str(soup)
+
+        # Picture and Figure blocks store their own image
+        block_id = block.get("id")
+        if block_id in block_images:
+            images[_image_name(block_id)] = block_images[block_id]
+            html = f"<p>{html}<img src='{_image_name(block_id)}'></p>"
+        return html, images
+
+    images = {}
+    child_html = {}
+    for child in children:
+        child_html[child["id"]], child_images = json_to_html(child)
+        images.update(child_images)
+
+    if not html:
+        return "".join(child_html.values()), images
+
+    soup = BeautifulSoup(html, "html.parser")
+    for ref in soup.find_all("content-ref"):
+        src = ref.attrs.get("src")
+        if src in child_html:
+            ref.replace_with(BeautifulSoup(child_html[src], "html.parser"))
+        else:
+            ref.decompose()
+    return str(soup), images
+
+
+def render_intermediate(intermediate: str, ext: str, output_path: str) -> str:
+    """
+    Render a single chunk's JSON intermediate into the format for `ext`.
+    The text matches marker's renderers, but whitespace and markdown table layout can differ.
+    """
+    if ext == ".json":
+        return intermediate
+
+    html, images = json_to_html(json.loads(intermediate))
+    for image_name, image in images.items():
+        image_path = os.path.join(output_path, image_name)
+        if not os.path.exists(image_path):
+            with open(image_path, "wb") as f:
+                f.write(base64.b64decode(image))
+
+    html = _merge_consecutive_tags(html, "b")
+    html = _merge_consecutive_tags(html, "i")
+
+    match ext:
+        case ".html":
+            return f'<!DOCTYPE html><html><head><meta charset="utf-8" /></head><body>{html}</body></html>'
+        case ".md":
+            markdown = Markdownify().convert(html)
+            return re.sub(r"\n{3,}", "\n\n", markdown).strip()
+        case _:
+            raise NotImplementedError(f"Unrecognized result type with extension {ext}")
+
+
+def _has_intermediate(output_path: str):
+    return os.path.isdir(os.path.join(output_path, INTERMEDIATE_DIR))
+
+
+def _render_chunk_files(output_path: str, ext: str):
+    """Helper function to render each chunk's intermediate to `ext` and return the merged result. Safe to call repeatedly."""
+    rendered_file_path = os.path.join(output_path, f"rendered{ext}")
+    if os.path.exists(rendered_file_path):
+        with open(rendered_file_path, "r") as f:
+            return f.read()
+
+    intermediate_files = [
+        fname
+        for fname in glob.glob(
+            os.path.join(output_path, INTERMEDIATE_DIR, "*-of-*.json")
+        )
+        if "meta.json" not in fname
+    ]
+
+    if not intermediate_files:
+        return None
+
+    fname, _ = os.path.splitext(os.path.basename(intermediate_files[0]))
+    num_chunks = int(fname.split("-of-")[1])
+
+    if len(intermediate_files) < num_chunks:
+        return None
+
+    results = []
+    for file in sorted(intermediate_files):
+        with open(file, "r") as f:
+            results.append(render_intermediate(f.read(), ext, output_path))
+
+    rendered_result = merge_marker_results(results, ext)
+
+    # Cache the rendered result next to merged.*
+    _write_atomic(rendered_file_path, rendered_result)
+
+    return rendered_result
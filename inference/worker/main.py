@@ -1,3 +1,4 @@
+import glob
 import json
 import os
 import pika
@@ -11,6 +12,7 @@ from marker.models import create_model_dict
 from marker.converters.pdf import PdfConverter
 from marker.config.parser import ConfigParser
 from marker.output import save_output
+from marker.renderers.json import JSONRenderer
 from surya.settings import settings as surya_settings
 
 # Configuration
@@ -27,9 +29,11 @@ TABLE_REC_BATCH_SIZE = int(os.getenv("TABLE_REC_BATCH_SIZE", 12))
 LAYOUT_BATCH_SIZE = int(os.getenv("LAYOUT_BATCH_SIZE", 12))
 OCR_ERROR_BATCH_SIZE = int(os.getenv("OCR_ERROR_BATCH_SIZE", 12))
 TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", 2))
+INTERMEDIATE_DIR = "intermediate"
 
 TASK_Q = queue.Queue(maxsize=50)  # messages → worker
 RESULT_Q = queue.Queue()  # (delivery_tag, ok) → listener
+MERGE_Q = queue.Queue()  # file_id of fully processed jobs → listener
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -52,21 +56,32 @@ def add_multiprocessing_config(config: dict):
     )
 
 
-def marker_inference(file_path, config, model_dict):
+def marker_inference(file_path, config, model_dict, keep_intermediate=False):
     add_multiprocessing_config(config)
     config_parser = ConfigParser(config)
     config_dict = config_parser.generate_config_dict()
     set_batch_sizes(config_dict)
 
-    rendered = PdfConverter(
+    converter = PdfConverter(
         config=config_dict,
         artifact_dict=model_dict,
         processor_list=config_parser.get_processors(),
         renderer=config_parser.get_renderer(),
         llm_service=config_parser.get_llm_service(),
-    )(file_path)
+    )
+
+    # Build the document once, so the intermediate can be rendered without re-running inference
+    document = converter.build_document(file_path)
+    rendered = converter.resolve_dependencies(converter.renderer)(document)
+
+    intermediate = None
+    if keep_intermediate:
+        if config.get("output_format") == "json":
+            intermediate = rendered
+        else:
+            intermediate = converter.resolve_dependencies(JSONRenderer)(document)
 
-    return rendered, config_dict
+    return rendered, intermediate, config_dict
 
 
 def run_marker_inference(
@@ -82,16 +97,25 @@ def run_marker_inference(
     os.makedirs(output_dir, exist_ok=True)
 
     config["filepath"] = file_path
+    keep_intermediate = bool(config.pop("keep_intermediate", False))
     if "output_format" not in config:
         config["output_format"] = "markdown"
 
     start_time = time.time()
-    rendered, config_dict = marker_inference(file_path, config, marker_model_dict)
+    rendered, intermediate, config_dict = marker_inference(
+        file_path, config, marker_model_dict, keep_intermediate
+    )
     end_time = time.time()
 
     output_name = f"{chunk_idx:05}-of-{num_chunks:05}"
     save_output(rendered, output_dir, output_name)
 
+    # Keep the JSON block tree, so other formats can be rendered without re-inference
+    if intermediate is not None:
+        intermediate_dir = os.path.join(output_dir, INTERMEDIATE_DIR)
+        os.makedirs(intermediate_dir, exist_ok=True)
+        save_output(intermediate, intermediate_dir, output_name)
+
     # Write worker-specific info
     meta_name = f"{chunk_idx}_worker_info.json"
     worker_info = {
@@ -113,6 +137,11 @@ def run_marker_inference(
         f"Completed processing: {file_path} -------- Chunk {chunk_idx} of {num_chunks}"
     )
 
+    # Worker info is written last, so once every chunk has one the job is ready to merge
+    # If two chunks finish together both may enqueue a merge, the server merges idempotently
+    if len(glob.glob(os.path.join(output_dir, "*_worker_info.json"))) >= num_chunks:
+        MERGE_Q.put(message.get("id"))
+
 
 def rabbit_listener():
     """RabbitMQ listener thread - handles connection and message routing."""
@@ -129,6 +158,7 @@ def rabbit_listener():
             )
             ch = conn.channel()
             ch.queue_declare(queue="marker_queue", durable=True)
+            ch.queue_declare(queue="merge_queue", durable=True)
             ch.basic_qos(prefetch_count=1)
 
             def on_msg(ch, method, props, body):
@@ -144,6 +174,23 @@ def rabbit_listener():
             while True:  # main I/O loop
                 conn.process_data_events(time_limit=1)  # pumps heartbeats
                 time.sleep(0.5)
+
+                # Publish merges before acking, so a finished job is never lost
+                while not MERGE_Q.empty():
+                    file_id = MERGE_Q.get_nowait()
+                    try:
+                        ch.basic_publish(
+                            exchange="",
+                            routing_key="merge_queue",
+                            body=json.dumps({"id": file_id}).encode(),
+                            properties=pika.BasicProperties(
+                                delivery_mode=pika.DeliveryMode.Persistent
+                            ),
+                        )
+                    except pika.exceptions.AMQPError:
+                        MERGE_Q.put(file_id)  # Retry once reconnected
+                        raise
+
                 try:
                     tag, ok = RESULT_Q.get_nowait()
                     try:
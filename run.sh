@@ -21,6 +21,7 @@ export DETECTOR_POSTPROCESSING_CPU_WORKERS=${DATALAB_DETECTOR_POSTPROCESSING_CPU
 
 # Inference service environment variables
 export DATALAB_INFERENCE_PORT=${DATALAB_INFERENCE_PORT:-8000}
+export MERGE_WORKERS=${DATALAB_INFERENCE_MERGE_WORKERS:-2}
 
 # Used in this script
 DATALAB_VRAM_PER_WORKER=${DATALAB_VRAM_PER_WORKER:-7}
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the service at temporary directories before any inference module is imported
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp())
+os.environ.setdefault("OUTPUT_DIR", tempfile.mkdtemp())
+
+
+def _build_pdf(text: str) -> bytes:
+    """Build a single page PDF with one line of Helvetica text."""
+    stream = f"BT /F1 24 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+    return pdf
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "test.pdf"
+    path.write_bytes(_build_pdf("Hello from the inference service"))
+    return str(path)
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("fastapi")
+
+from inference.server.merge import (  # noqa: E402
+    _chunks_complete,
+    _get_merged_file,
+    _merge_chunk_files,
+)
+
+
+def _write_chunk(output_path, chunk_idx, num_chunks, text):
+    with open(
+        os.path.join(output_path, f"{chunk_idx:05}-of-{num_chunks:05}.md"), "w"
+    ) as f:
+        f.write(text)
+
+
+def _write_worker_info(output_path, chunk_idx):
+    with open(os.path.join(output_path, f"{chunk_idx}_worker_info.json"), "w") as f:
+        f.write('{"pages": 1, "total_time": 1.0}')
+
+
+def test_merge_chunk_files(tmp_path):
+    output_path = str(tmp_path)
+    _write_chunk(output_path, 0, 2, "first")
+    assert _merge_chunk_files(output_path) is None
+
+    _write_chunk(output_path, 1, 2, "second")
+    merged_file = _merge_chunk_files(output_path)
+    assert merged_file == os.path.join(output_path, "merged.md")
+    with open(merged_file, "r") as f:
+        assert f.read() == "first\nsecond"
+
+    # Merging again reuses the finished file
+    os.remove(os.path.join(output_path, "00000-of-00002.md"))
+    assert _merge_chunk_files(output_path) == merged_file
+
+
+def test_get_merged_file_ignores_partial_writes(tmp_path):
+    (tmp_path / "merged.md.tmp").write_text("partial")
+    assert _get_merged_file(str(tmp_path)) is None
+
+
+def test_chunks_complete(tmp_path):
+    output_path = str(tmp_path)
+    assert not _chunks_complete(output_path)
+
+    _write_chunk(output_path, 0, 2, "first")
+    _write_chunk(output_path, 1, 2, "second")
+    _write_worker_info(output_path, 0)
+    assert not _chunks_complete(output_path)
+
+    _write_worker_info(output_path, 1)
+    assert _chunks_complete(output_path)
@@ -0,0 +1,105 @@
+import base64
+import json
+import os
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("markdownify")
+
+from inference.server.files import INTERMEDIATE_DIR  # noqa: E402
+from inference.server.render import (  # noqa: E402
+    _render_chunk_files,
+    json_to_html,
+    render_intermediate,
+)
+
+IMAGE = base64.b64encode(b"not really a jpeg").decode()
+
+
+def _block(block_id, html, **kwargs):
+    block_type = block_id.split("/")[3]
+    return {
+        "id": block_id,
+        "block_type": block_type,
+        "html": html,
+        "polygon": [[0, 0], [1, 0], [1, 1], [0, 1]],
+        "bbox": [0, 0, 1, 1],
+        **kwargs,
+    }
+
+
+def _intermediate():
+    """A single page in the layout of marker's JSONRenderer."""
+    page = _block(
+        "/page/0/Page/0",
+        "<content-ref src='/page/0/SectionHeader/1'></content-ref>"
+        "<content-ref src='/page/0/Table/2'></content-ref>"
+        "<content-ref src='/page/0/Picture/3'></content-ref>"
+        "<content-ref src='/page/0/Text/4'></content-ref>",
+        children=[
+            _block("/page/0/SectionHeader/1", "<h1>Results</h1>", images={}),
+            _block(
+                "/page/0/Table/2",
+                "<table><tr><th>Name</th><th>Cost</th></tr>"
+                "<tr><td>Widget</td><td>$5</td></tr></table>",
+                images={},
+            ),
+            _block("/page/0/Picture/3", "", images={"/page/0/Picture/3": IMAGE}),
+            # Images nested in a leaf are left as refs by marker
+            _block(
+                "/page/0/Text/4",
+                "<p>See <math>x^2</math></p>"
+                "<content-ref src='/page/0/Figure/5'></content-ref>",
+                images={"/page/0/Figure/5": IMAGE},
+            ),
+        ],
+    )
+    return json.dumps({"children": [page], "block_type": "Document"})
+
+
+def test_json_to_html_resolves_refs():
+    html, images = json_to_html(json.loads(_intermediate()))
+
+    assert "content-ref" not in html
+    assert "<h1>Results</h1>" in html
+    assert "<td>Widget</td>" in html
+    assert "<img src='_page_0_Picture_3.jpeg'" in html.replace('"', "'")
+    assert set(images) == {"_page_0_Picture_3.jpeg", "_page_0_Figure_5.jpeg"}
+
+
+def test_render_markdown(tmp_path):
+    markdown = render_intermediate(_intermediate(), ".md", str(tmp_path))
+
+    assert "content-ref" not in markdown
+    assert markdown.startswith("# Results")
+    assert "| Name | Cost |" in markdown
+    assert "| Widget | \\$5 |" in markdown
+    assert "![](_page_0_Picture_3.jpeg)" in markdown
+    assert "![](_page_0_Figure_5.jpeg)" in markdown
+    assert "$x^2$" in markdown
+
+    with open(tmp_path / "_page_0_Picture_3.jpeg", "rb") as f:
+        assert f.read() == b"not really a jpeg"
+
+
+def test_render_chunk_files(tmp_path):
+    intermediate_dir = tmp_path / INTERMEDIATE_DIR
+    intermediate_dir.mkdir()
+    for i in range(2):
+        (intermediate_dir / f"{i:05}-of-00002.json").write_text(_intermediate())
+        (intermediate_dir / f"{i:05}-of-00002_meta.json").write_text("{}")
+
+    html = _render_chunk_files(str(tmp_path), ".html")
+
+    assert html.count("<h1>Results</h1>") == 2
+    assert os.path.exists(tmp_path / "rendered.html")
+    assert _render_chunk_files(str(tmp_path), ".html") == html
+
+
+def test_render_chunk_files_incomplete(tmp_path):
+    intermediate_dir = tmp_path / INTERMEDIATE_DIR
+    intermediate_dir.mkdir()
+    (intermediate_dir / "00000-of-00002.json").write_text(_intermediate())
+
+    assert _render_chunk_files(str(tmp_path), ".md") is None
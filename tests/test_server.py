@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+pytest.importorskip("aio_pika")
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from inference.server import main  # noqa: E402
+from inference.server.files import get_output_path  # noqa: E402
+
+
+@pytest.fixture
+def published(monkeypatch):
+    messages = []
+
+    async def publish(routing_key, body, reconnect=True):
+        messages.append((routing_key, body))
+
+    monkeypatch.setattr(main, "publish", publish)
+    monkeypatch.setattr(main, "merge_requested", set())
+    return messages
+
+
+@pytest.fixture
+def output_path():
+    path = get_output_path("test-job")
+    os.makedirs(path, exist_ok=True)
+    yield path
+    main.shutil.rmtree(path, ignore_errors=True)
+
+
+class FakeMessage:
+    def __init__(self, body):
+        self.body = json.dumps(body).encode()
+
+    def process(self, requeue=False):
+        class Context:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, *args):
+                return False
+
+        return Context()
+
+
+def test_job_lock_is_exclusive_and_dropped_when_released():
+    events = []
+
+    async def hold(name):
+        async with main.job_lock("test-job"):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            assert main.job_lock_users["test-job"] >= 1
+            events.append(f"{name} end")
+
+    async def run():
+        await asyncio.gather(hold("first"), hold("second"))
+
+    asyncio.run(run())
+
+    assert events == ["first start", "first end", "second start", "second end"]
+    assert "test-job" not in main.job_locks
+    assert "test-job" not in main.job_lock_users
+
+
+def test_results_enqueues_merge_for_finished_chunks(published, output_path):
+    with open(os.path.join(output_path, "00000-of-00001.md"), "w") as f:
+        f.write("done")
+    with open(os.path.join(output_path, "0_worker_info.json"), "w") as f:
+        f.write('{"pages": 1, "total_time": 1.0}')
+
+    client = TestClient(main.app)
+    for _ in range(2):
+        res = client.get("/marker/results", params={"file_id": "test-job"})
+        assert res.json()["status"] == "processing"
+
+    # Repeated polls only enqueue once, and never merge in the request
+    assert published == [("merge_queue", {"id": "test-job"})]
+    assert main._get_merged_file(output_path) is None
+
+
+def test_merge_retries_incomplete_chunks(published, output_path, monkeypatch):
+    monkeypatch.setattr(main, "MERGE_RETRY_DELAY", 0)
+
+    async def run_locked_in_pool(file_id, fn, *args):
+        return fn(*args)
+
+    monkeypatch.setattr(main, "run_locked_in_pool", run_locked_in_pool)
+
+    with open(os.path.join(output_path, "00000-of-00002.md"), "w") as f:
+        f.write("first")
+
+    asyncio.run(main.on_merge_message(FakeMessage({"id": "test-job"})))
+    assert published == [("merge_queue", {"id": "test-job", "attempt": 1})]
+
+    attempt = main.MERGE_MAX_ATTEMPTS - 1
+    asyncio.run(
+        main.on_merge_message(FakeMessage({"id": "test-job", "attempt": attempt}))
+    )
+    assert len(published) == 1
+    with open(os.path.join(output_path, "ERROR"), "r") as f:
+        assert "incomplete" in f.read()
+
+
+def test_merge_retries_broken_pool(published, output_path, monkeypatch):
+    monkeypatch.setattr(main, "MERGE_RETRY_DELAY", 0)
+
+    async def run_locked_in_pool(file_id, fn, *args):
+        raise BrokenProcessPool("A child process terminated abruptly")
+
+    monkeypatch.setattr(main, "run_locked_in_pool", run_locked_in_pool)
+
+    with open(os.path.join(output_path, "00000-of-00001.md"), "w") as f:
+        f.write("done")
+
+    asyncio.run(main.on_merge_message(FakeMessage({"id": "test-job"})))
+    assert published == [("merge_queue", {"id": "test-job", "attempt": 1})]
+    assert not os.path.exists(os.path.join(output_path, "ERROR"))
+
+
+def test_run_locked_in_pool_recreates_broken_pool(monkeypatch):
+    monkeypatch.setattr(main, "merge_pool", main.create_merge_pool())
+    broken_pool = main.merge_pool
+
+    async def run():
+        with pytest.raises(BrokenProcessPool):
+            await main.run_locked_in_pool("test-job", os._exit, 1)
+        return await main.run_locked_in_pool("test-job", os.getpid)
+
+    try:
+        assert isinstance(asyncio.run(run()), int)
+        assert main.merge_pool is not broken_pool
+    finally:
+        main.merge_pool.shutdown()
+
+
+def test_results_survives_enqueue_failure(monkeypatch, output_path):
+    async def publish(routing_key, body, reconnect=True):
+        assert not reconnect
+        raise RuntimeError("RabbitMQ connection is not open")
+
+    monkeypatch.setattr(main, "publish", publish)
+    monkeypatch.setattr(main, "merge_requested", set())
+
+    with open(os.path.join(output_path, "00000-of-00001.md"), "w") as f:
+        f.write("done")
+    with open(os.path.join(output_path, "0_worker_info.json"), "w") as f:
+        f.write('{"pages": 1, "total_time": 1.0}')
+
+    res = TestClient(main.app).get("/marker/results", params={"file_id": "test-job"})
+    assert res.status_code == 200
+    assert res.json()["status"] == "processing"
+    # Not marked as requested, so the next poll tries again
+    assert "test-job" not in main.merge_requested
@@ -0,0 +1,47 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("marker")
+
+from inference.worker.main import (  # noqa: E402
+    INTERMEDIATE_DIR,
+    MERGE_Q,
+    run_marker_inference,
+)
+
+
+@pytest.fixture(scope="module")
+def model_dict():
+    from marker.models import create_model_dict
+
+    return create_model_dict()
+
+
+def test_keep_intermediate(model_dict, pdf_path, tmp_path):
+    output_dir = str(tmp_path / "output")
+    message = {
+        "id": "keep-intermediate",
+        "chunk_idx": 0,
+        "num_chunks": 1,
+        "config": {"page_range": "0", "keep_intermediate": True},
+    }
+
+    run_marker_inference(message, model_dict, pdf_path, output_dir)
+
+    assert os.path.exists(os.path.join(output_dir, "00000-of-00001.md"))
+    assert os.path.exists(os.path.join(output_dir, "0_worker_info.json"))
+
+    intermediate_file = os.path.join(
+        output_dir, INTERMEDIATE_DIR, "00000-of-00001.json"
+    )
+    with open(intermediate_file, "r") as f:
+        intermediate = json.load(f)
+    assert intermediate["children"]
+
+    # keep_intermediate is a service option, it shouldn't reach marker's config
+    with open(os.path.join(output_dir, "config.json"), "r") as f:
+        assert "keep_intermediate" not in json.load(f)
+
+    assert MERGE_Q.get_nowait() == "keep-intermediate"